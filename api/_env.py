@@ -0,0 +1,10 @@
+from dotenv import load_dotenv
+
+_loaded = False
+
+def ensure():
+    """Load the .env file into the environment once per process, however many modules ask for it."""
+    global _loaded
+    if not _loaded:
+        load_dotenv()
+        _loaded = True
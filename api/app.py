@@ -1,118 +1,278 @@
 import os
 import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from openai import AzureOpenAI
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import httpx
+import orjson
+import uvicorn
+from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+from openai import AsyncAzureOpenAI
+import _env
+from config import CFG
 from prompt_utils import load_system_prompt
+from semantic_cache import SemanticCache
+from request_coalescer import RequestCoalescer
 
 # Load environment variables
-load_dotenv()
+_env.ensure()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Shared Azure OpenAI client, created on first use and reused across requests so
+# the underlying httpx pool keeps connections to the endpoint alive
+_client = None
+_semantic_cache = None
 
-# Azure OpenAI Configuration
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+# Identical /chat requests that arrive while one is already in flight share its upstream call
+_coalescer = RequestCoalescer()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if _client is not None:
+        await _client.close()
+    if _semantic_cache is not None:
+        await _semantic_cache.close()
+
+app = FastAPI(title="Hackathon 2025 OpenAI API", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# CORS is expected to be handled by the reverse proxy in front of the API; only enable the
+# in-process middleware when origins are configured (e.g. local development without a proxy)
+CORS_ALLOW_ORIGINS = [o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "").split(",") if o.strip()]
+if CORS_ALLOW_ORIGINS:
+    app.add_middleware(CORSMiddleware, allow_origins=CORS_ALLOW_ORIGINS, allow_methods=["GET", "POST"], allow_headers=["Content-Type"])
+
+# Upstream HTTP connection pool settings
+HTTP_MAX_CONNECTIONS = 200
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 100
+HTTP_TIMEOUT_SECONDS = 30.0
+
+# Semantic response cache (disabled unless a Redis URL is configured)
+SEMANTIC_CACHE_REDIS_URL = os.getenv("SEMANTIC_CACHE_REDIS_URL")
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", 0.95))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", 86400))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", 1536))
+
+class ChatRequest(BaseModel):
+    message: str
+    system_prompt: str | None = None
+    max_tokens: int = 500
+    temperature: float = 0.7
+    stream: bool = False
+
+class Usage(BaseModel):
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+class ChatResponse(BaseModel):
+    response: str | None
+    model: str | None
+    usage: Usage
+    cached: bool = False
 
 # Initialize Azure OpenAI client
 def get_openai_client():
-    if not AZURE_OPENAI_API_KEY:
+    global _client
+    if _client is not None:
+        return _client
+
+    if not CFG.api_key:
         raise ValueError("AZURE_OPENAI_API_KEY environment variable is not set")
-    
-    return AzureOpenAI(
-        api_key=AZURE_OPENAI_API_KEY,
-        api_version=AZURE_OPENAI_API_VERSION,
-        azure_endpoint=AZURE_OPENAI_ENDPOINT
+
+    _client = AsyncAzureOpenAI(
+        api_key=CFG.api_key,
+        api_version=CFG.api_version,
+        azure_endpoint=CFG.endpoint,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=HTTP_TIMEOUT_SECONDS
+        )
     )
+    return _client
+
+def get_semantic_cache():
+    global _semantic_cache
+    if _semantic_cache is None and SEMANTIC_CACHE_REDIS_URL:
+        _semantic_cache = SemanticCache(
+            SEMANTIC_CACHE_REDIS_URL,
+            AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            threshold=CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+            dimensions=SEMANTIC_CACHE_DIMENSIONS
+        )
+    return _semantic_cache
+
+def _sse_event(payload) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+async def _stream_chat(stream, cache, vector, user_message, system_prompt):
+    """Forward completion deltas as server-sent events, caching the full reply once it is complete"""
+    parts = []
+    finish_reason = None
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield _sse_event({"delta": delta})
+    except Exception as e:
+        logger.error(f"Error streaming from OpenAI: {e}")
+        yield _sse_event({"error": f"Failed to generate response: {str(e)}"})
+        return
+
+    logger.info("Successfully streamed AI response")
+    # Only cache complete replies; ones cut short by max_tokens or the content filter are not reusable
+    if vector is not None and parts and finish_reason == "stop":
+        await cache.store(vector, user_message, "".join(parts), system_prompt, CFG.deployment)
+    yield b"data: [DONE]\n\n"
 
-@app.route("/", methods=["GET"])
-def health_check():
+async def _stream_cached(cached_response):
+    yield _sse_event({"delta": cached_response, "cached": True})
+    yield b"data: [DONE]\n\n"
+
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc):
+    """Report malformed request bodies as 400s in the API's usual error shape"""
+    errors = exc.errors()
+    if any(err["type"] == "missing" and tuple(err["loc"]) in (("body",), ("body", "message")) for err in errors):
+        return ORJSONResponse({"error": "Missing 'message' in request body"}, status_code=400)
+    if any(err["type"] == "json_invalid" for err in errors):
+        return ORJSONResponse({"error": "Request body is not valid JSON"}, status_code=400)
+    details = "; ".join(f"{'.'.join(str(part) for part in err['loc'][1:]) or 'body'}: {err['msg']}" for err in errors)
+    return ORJSONResponse({"error": f"Invalid request body: {details}"}, status_code=400)
+
+@app.get("/")
+async def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return {
         "status": "healthy",
         "message": "Hackathon 2025 OpenAI API is running!",
-        "endpoint": AZURE_OPENAI_ENDPOINT,
-        "deployment": AZURE_OPENAI_DEPLOYMENT
-    })
+        "endpoint": CFG.endpoint,
+        "deployment": CFG.deployment
+    }
 
-@app.route("/chat", methods=["POST"])
-def chat():
+@app.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest):
     """Chat endpoint that calls Azure OpenAI"""
     try:
-        # Get request data
-        data = request.get_json()
-        
-        if not data or "message" not in data:
-            return jsonify({"error": "Missing 'message' in request body"}), 400
-        
-        user_message = data["message"]
-        system_prompt = data.get("system_prompt", load_system_prompt("You are a helpful AI agent that answers questions when asked."))
-        max_tokens = data.get("max_tokens", 500)
-        temperature = data.get("temperature", 0.7)
-        
+        # Request body is parsed and validated by FastAPI against ChatRequest
+        user_message = req.message
+        system_prompt = req.system_prompt
+        if system_prompt is None:
+            system_prompt = load_system_prompt("You are a helpful AI agent that answers questions when asked.")
+        max_tokens = req.max_tokens
+        temperature = req.temperature
+        stream = req.stream
+
         logger.info(f"Received chat request: {user_message[:50]}...")
-        
-        # Initialize OpenAI client
+
+        # Reuse the shared OpenAI client
         client = get_openai_client()
-        
-        # Call Azure OpenAI
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        
+
+        # Serve near-duplicate questions from the semantic cache
+        cache = get_semantic_cache()
+        vector = None
+        if cache is not None:
+            vector = await cache.embed(client, user_message)
+            if vector is not None:
+                cached_response = await cache.lookup(vector, system_prompt, CFG.deployment)
+                if cached_response is not None:
+                    if stream:
+                        return StreamingResponse(_stream_cached(cached_response), media_type="text/event-stream")
+                    return ChatResponse(
+                        response=cached_response,
+                        model=CFG.deployment,
+                        usage=Usage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+                        cached=True
+                    )
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+
+        if stream:
+            response = await client.chat.completions.create(
+                model=CFG.deployment,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            return StreamingResponse(
+                _stream_chat(response, cache, vector, user_message, system_prompt),
+                media_type="text/event-stream"
+            )
+
+        async def complete():
+            # Call Azure OpenAI
+            response = await client.chat.completions.create(
+                model=CFG.deployment,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            ai_response = response.choices[0].message.content
+            if vector is not None and ai_response is not None and response.choices[0].finish_reason == "stop":
+                await cache.store(vector, user_message, ai_response, system_prompt, CFG.deployment)
+            return response
+
+        response = await _coalescer.run((system_prompt, user_message, max_tokens, temperature), complete)
+
         # Extract response
         ai_response = response.choices[0].message.content
-        
+
         logger.info("Successfully generated AI response")
-        
-        return jsonify({
-            "response": ai_response,
-            "model": AZURE_OPENAI_DEPLOYMENT,
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
-        })
-        
+
+        return ChatResponse(
+            response=ai_response,
+            model=CFG.deployment,
+            usage=Usage(
+                prompt_tokens=response.usage.prompt_tokens,
+                completion_tokens=response.usage.completion_tokens,
+                total_tokens=response.usage.total_tokens
+            )
+        )
+
     except ValueError as ve:
         logger.error(f"Configuration error: {ve}")
-        return jsonify({"error": f"Configuration error: {str(ve)}"}), 500
-        
+        return ORJSONResponse({"error": f"Configuration error: {str(ve)}"}, status_code=500)
+
     except Exception as e:
         logger.error(f"Error calling OpenAI: {e}")
-        return jsonify({"error": f"Failed to generate response: {str(e)}"}), 500
+        return ORJSONResponse({"error": f"Failed to generate response: {str(e)}"}, status_code=500)
 
-@app.route("/config", methods=["GET"])
-def get_config():
+@app.get("/config")
+async def get_config():
     """Get current API configuration (without sensitive data)"""
-    return jsonify({
-        "endpoint": AZURE_OPENAI_ENDPOINT,
-        "deployment": AZURE_OPENAI_DEPLOYMENT,
-        "api_version": AZURE_OPENAI_API_VERSION,
-        "api_key_configured": bool(AZURE_OPENAI_API_KEY)
-    })
+    return {
+        "endpoint": CFG.endpoint,
+        "deployment": CFG.deployment,
+        "api_version": CFG.api_version,
+        "api_key_configured": bool(CFG.api_key)
+    }
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
-    debug = os.getenv("FLASK_DEBUG", "False").lower() == "true"
-    
+    debug = os.getenv("DEBUG", "False").lower() == "true"
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+
     logger.info(f"Starting Hackathon 2025 OpenAI API on port {port}")
-    logger.info(f"Azure OpenAI Endpoint: {AZURE_OPENAI_ENDPOINT}")
-    logger.info(f"Deployment Name: {AZURE_OPENAI_DEPLOYMENT}")
-    
-    app.run(host="0.0.0.0", port=port, debug=debug)
\ No newline at end of file
+    logger.info(f"Azure OpenAI Endpoint: {CFG.endpoint}")
+    logger.info(f"Deployment Name: {CFG.deployment}")
+
+    # reload and multiple workers are mutually exclusive in uvicorn
+    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=debug, workers=None if debug else workers)
@@ -1,39 +1,40 @@
 #!/usr/bin/env python3
-import os
 import argparse
 import sys
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import _env
+from config import CFG
 from openai import AzureOpenAI
 from prompt_utils import load_system_prompt
 
-load_dotenv()
+_env.ensure()
 
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+# REPL history is summarized once its total content exceeds this many characters (~4 chars per token)
+DEFAULT_HISTORY_BUDGET = 16000
+# number of most recent messages kept verbatim when the history is summarized
+ROLLUP_KEEP_RECENT = 4
 
 def get_client():
     missing = []
-    if not AZURE_OPENAI_API_KEY:
+    if not CFG.api_key:
         missing.append("AZURE_OPENAI_API_KEY")
-    if not AZURE_OPENAI_ENDPOINT:
+    if not CFG.endpoint:
         missing.append("AZURE_OPENAI_ENDPOINT")
-    if not AZURE_OPENAI_DEPLOYMENT:
+    if not CFG.deployment:
         missing.append("AZURE_OPENAI_DEPLOYMENT")
-    if not AZURE_OPENAI_API_VERSION:
+    if not CFG.api_version:
         missing.append("AZURE_OPENAI_API_VERSION")
     if missing:
         raise RuntimeError(f"Missing required environment variable(s): {', '.join(missing)}")
     return AzureOpenAI(
-        api_key=AZURE_OPENAI_API_KEY,
-        api_version=AZURE_OPENAI_API_VERSION,
-        azure_endpoint=AZURE_OPENAI_ENDPOINT
+        api_key=CFG.api_key,
+        api_version=CFG.api_version,
+        azure_endpoint=CFG.endpoint
     )
 
 def single_request(client, user_message, system_prompt, max_tokens, temperature):
     resp = client.chat.completions.create(
-        model=AZURE_OPENAI_DEPLOYMENT,
+        model=CFG.deployment,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
@@ -56,9 +57,70 @@ def single_request(client, user_message, system_prompt, max_tokens, temperature)
     except Exception as e:
         print(f"Warning: Could not retrieve usage information: {e}", file=sys.stderr)
 
-def repl_loop(client, system_prompt, max_tokens, temperature):
-    print("Entering interactive REPL. Type your message and press Enter.")
-    print("Commands: /exit to quit, /reset to clear conversation, /history to show conversation")
+def _rollup(client, messages, budget, max_tokens):
+    """
+    Keep the conversation within `budget` characters by replacing older turns with a summary.
+    The system prompt and the most recent messages are kept verbatim, and earlier entries are
+    never edited in place, so the request prefix stays byte-identical between rollups and
+    remains eligible for server-side prompt caching.
+    """
+    if budget <= 0 or sum(len(m.get("content") or "") for m in messages) <= budget:
+        return messages
+    older = messages[1:-ROLLUP_KEEP_RECENT]
+    if not older:
+        return messages
+
+    transcript = "\n".join(f"[{m.get('role', 'unknown')}] {m.get('content', '')}" for m in older)
+    try:
+        resp = client.chat.completions.create(
+            model=CFG.deployment,
+            messages=[
+                {"role": "system", "content": "Summarize the following conversation concisely, keeping every fact, decision and open question needed to continue it."},
+                {"role": "user", "content": transcript}
+            ],
+            max_tokens=max_tokens,
+            temperature=0
+        )
+        summary = resp.choices[0].message.content if resp.choices else None
+    except Exception as e:
+        print(f"Warning: Could not summarize conversation history: {e}", file=sys.stderr)
+        return messages
+    if not summary:
+        return messages
+
+    return [
+        messages[0],
+        {"role": "assistant", "content": f"Summary of the earlier conversation: {summary}"},
+        *messages[-ROLLUP_KEEP_RECENT:]
+    ]
+
+# REPL command handlers take the current history and return the history to continue with (None to quit)
+def _cmd_exit(messages, system_prompt):
+    print("Goodbye.")
+    return None
+
+def _cmd_reset(messages, system_prompt):
+    print("Conversation reset.")
+    return [{"role": "system", "content": system_prompt}]
+
+def _cmd_history(messages, system_prompt):
+    # build the whole dump first so it is written in one call rather than one print per message
+    lines = [f"[{m.get('role', 'unknown')}] {m.get('content', '')}" for m in messages]
+    sys.stdout.write("--- Conversation history ---\n" + "\n".join(lines) + "\n---------------------------\n")
+    return messages
+
+_COMMANDS = {
+    "/exit": _cmd_exit,
+    "/quit": _cmd_exit,
+    "/reset": _cmd_reset,
+    "/history": _cmd_history,
+}
+
+def repl_loop(client, system_prompt, max_tokens, temperature, history_budget=DEFAULT_HISTORY_BUDGET):
+    sys.stdout.write(
+        "Entering interactive REPL. Type your message and press Enter.\n"
+        "Commands: /exit to quit, /reset to clear conversation, /history to show conversation\n"
+    )
     messages = [{"role": "system", "content": system_prompt}]
 
     while True:
@@ -71,42 +133,43 @@ def repl_loop(client, system_prompt, max_tokens, temperature):
         if not user_input:
             continue
 
-        if user_input.lower() in ("/exit", "/quit"):
-            print("Goodbye.")
-            break
-        if user_input.lower() == "/reset":
-            messages = [{"role": "system", "content": system_prompt}]
-            print("Conversation reset.")
-            continue
-        if user_input.lower() == "/history":
-            print("--- Conversation history ---")
-            for m in messages:
-                role = m.get("role", "unknown")
-                content = m.get("content", "")
-                print(f"[{role}] {content}")
-            print("---------------------------")
+        handler = _COMMANDS.get(user_input.lower())
+        if handler:
+            messages = handler(messages, system_prompt)
+            if messages is None:
+                break
             continue
 
         # append user message and call API
         messages.append({"role": "user", "content": user_input})
+        messages = _rollup(client, messages, history_budget, max_tokens)
         try:
             resp = client.chat.completions.create(
-                model=AZURE_OPENAI_DEPLOYMENT,
+                model=CFG.deployment,
                 messages=messages,
                 max_tokens=max_tokens,
-                temperature=temperature
+                temperature=temperature,
+                stream=True
             )
-            if not resp.choices:
-                print("Error: No response choices returned by OpenAI.", file=sys.stderr)
-                continue
-            ai_text = resp.choices[0].message.content
-            if ai_text is None:
+            # print tokens as they arrive and accumulate the full reply for the history
+            parts = []
+            for chunk in resp:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    # one write and flush per chunk so every token is visible as soon as it arrives
+                    sys.stdout.write(delta if parts else "AI> " + delta)
+                    sys.stdout.flush()
+                    parts.append(delta)
+            if not parts:
                 print("Warning: Received empty response from assistant; adding empty assistant message to conversation history.\n", file=sys.stderr)
                 messages.append({"role": "assistant", "content": ""})
             else:
-                print(f"AI> {ai_text}\n")
+                sys.stdout.write("\n\n")
+                sys.stdout.flush()
                 # append assistant reply to conversation so context is preserved
-                messages.append({"role": "assistant", "content": ai_text})
+                messages.append({"role": "assistant", "content": "".join(parts)})
         except Exception as e:
             print(f"Error calling OpenAI: {e}", file=sys.stderr)
 
@@ -116,6 +179,8 @@ def main():
     p.add_argument("--system", default=load_system_prompt("You are a helpful AI agent."), help="System prompt")
     p.add_argument("--max-tokens", type=int, default=500)
     p.add_argument("--temperature", type=float, default=0.7)
+    p.add_argument("--history-budget", type=int, default=DEFAULT_HISTORY_BUDGET,
+                   help="Summarize older REPL turns once the history exceeds this many characters (0 disables)")
     args = p.parse_args()
 
     # determine mode: single message (flag or piped input) or interactive REPL
@@ -126,18 +191,20 @@ def main():
         return
 
     if not sys.stdin.isatty():
-        # piped input -> treat entire stdin as a single message
-        user_message = sys.stdin.read().strip()
-        if not user_message:
-            print("No input provided", file=sys.stderr)
-            return
-        client = get_client()
+        # piped input -> treat entire stdin as a single message; build the client while stdin drains
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            client_future = pool.submit(get_client)
+            user_message = sys.stdin.buffer.read().decode("utf-8", errors="replace").strip()
+            if not user_message:
+                print("No input provided", file=sys.stderr)
+                return
+            client = client_future.result()
         single_request(client, user_message, args.system, args.max_tokens, args.temperature)
         return
 
     # interactive REPL
     client = get_client()
-    repl_loop(client, args.system, args.max_tokens, args.temperature)
+    repl_loop(client, args.system, args.max_tokens, args.temperature, args.history_budget)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,20 @@
+import os
+from dataclasses import dataclass
+import _env
+
+_env.ensure()
+
+@dataclass(frozen=True, slots=True)
+class AzureCfg:
+    """Azure OpenAI connection settings, read from the environment once at import."""
+    api_key: str | None
+    endpoint: str | None
+    deployment: str | None
+    api_version: str | None
+
+CFG = AzureCfg(
+    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+    endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+    api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+)
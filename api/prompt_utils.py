@@ -1,19 +1,29 @@
 import os
 import re
-from dotenv import load_dotenv
+from functools import lru_cache
+import _env
 
 # Ensure environment variables are loaded if this module is imported standalone
-load_dotenv()
+_env.ensure()
 
+_MULTI_NEWLINE = re.compile(r"\n{3,}")
+
+@lru_cache(maxsize=64)
 def _normalize_raw_prompt(raw: str) -> str:
     # Convert escaped \n sequences into actual newlines (harmless if file already contains real newlines)
     normalized = raw.replace("\\n", "\n")
     # Trim whitespace
     normalized = normalized.strip()
     # Collapse runs of 3+ newlines into 2
-    normalized = re.sub(r"\n{3,}", "\n\n", normalized)
+    normalized = _MULTI_NEWLINE.sub("\n\n", normalized)
     return normalized
 
+@lru_cache(maxsize=64)
+def _read_prompt_file(path: str, mtime_ns: int) -> str:
+    # Keyed on mtime so an edited prompt file is re-read; I/O errors propagate and are not cached
+    with open(path, "r", encoding="utf-8") as fh:
+        return _normalize_raw_prompt(fh.read())
+
 def load_system_prompt(fallback: str | None = None) -> str | None:
     """
     Load the system prompt, preferring a prompt file specified by DEFAULT_SYSTEM_PROMPT_FILE.
@@ -21,15 +31,14 @@ def load_system_prompt(fallback: str | None = None) -> str | None:
       1. If DEFAULT_SYSTEM_PROMPT_FILE is set and the file exists, return its contents.
       2. Else, if DEFAULT_SYSTEM_PROMPT is set, return that (converting literal "\n" to newlines).
       3. Else, return the provided fallback.
+    Results are cached, so repeated calls only stat the prompt file.
     """
     # 1) Try file
     file_path = os.getenv("DEFAULT_SYSTEM_PROMPT_FILE")
     if file_path:
         expanded = os.path.expandvars(os.path.expanduser(file_path))
         try:
-            with open(expanded, "r", encoding="utf-8") as fh:
-                raw = fh.read()
-                return _normalize_raw_prompt(raw)
+            return _read_prompt_file(expanded, os.stat(expanded).st_mtime_ns)
         except FileNotFoundError:
             # File pointer set but missing; fall back to env var below
             pass
@@ -43,4 +52,4 @@ def load_system_prompt(fallback: str | None = None) -> str | None:
         return _normalize_raw_prompt(raw_env)
 
     # 3) Fallback
-    return fallback
\ No newline at end of file
+    return fallback
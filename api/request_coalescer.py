@@ -0,0 +1,23 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+class RequestCoalescer:
+    """
+    Share a single upstream call between identical requests that are in flight together.
+
+    The first caller for a key starts `factory()`; callers arriving with the same key
+    before it finishes await the same result (or exception) instead of issuing their
+    own call. Nothing is kept once the call completes, so this never serves stale data.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one disconnected caller does not cancel the call for everyone else
+        return await asyncio.shield(future)
@@ -0,0 +1,157 @@
+import array
+import base64
+import hashlib
+import logging
+import re
+import uuid
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+from redis.commands.search.field import NumericField, TagField, TextField, VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+logger = logging.getLogger(__name__)
+
+# Characters that must be escaped inside a RediSearch TAG filter
+_TAG_ESCAPE = re.compile(r"([^A-Za-z0-9_])")
+
+def _escape_tag(value: str) -> str:
+    return _TAG_ESCAPE.sub(r"\\\1", value)
+
+def _hash_prompt(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+class SemanticCache:
+    """
+    Redis-backed cache of chat responses, looked up by embedding similarity.
+
+    Entries are partitioned by system prompt and model so a cached answer is only
+    reused for the same persona and deployment. A lookup is a hit when the cosine
+    similarity between the new message and the closest cached message is at least
+    `threshold`. Redis or embedding failures are logged and treated as a miss. If the
+    embedding deployment returns vectors of a different size than `dimensions` (the
+    index DIM), the cache disables itself instead of paying for calls that can never hit.
+    """
+
+    def __init__(self, redis_url: str, embedding_deployment: str, threshold: float = 0.95,
+                 ttl_seconds: int = 86400, dimensions: int = 1536, index_name: str = "cache_idx"):
+        # Short timeouts so an unreachable Redis degrades to a cache miss instead of stalling /chat
+        self.redis = Redis.from_url(redis_url, socket_connect_timeout=1, socket_timeout=1)
+        self.embedding_deployment = embedding_deployment
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.dimensions = dimensions
+        self.index_name = index_name
+        self.key_prefix = f"{index_name}:"
+        self._index_ready = False
+        self._disabled = False
+
+    async def _ensure_index(self):
+        if self._index_ready:
+            return
+        index = self.redis.ft(self.index_name)
+        try:
+            await index.info()
+        except ResponseError:
+            await index.create_index(
+                [
+                    VectorField("embedding", "HNSW", {
+                        "TYPE": "FLOAT32",
+                        "DIM": self.dimensions,
+                        "DISTANCE_METRIC": "COSINE"
+                    }),
+                    TagField("prompt_hash"),
+                    TagField("model"),
+                    TextField("prompt"),
+                    TextField("response"),
+                    NumericField("hit_count")
+                ],
+                definition=IndexDefinition(prefix=[self.key_prefix], index_type=IndexType.HASH)
+            )
+        self._index_ready = True
+
+    async def embed(self, client, text: str) -> bytes | None:
+        """Embed `text` with the Azure OpenAI client; returns a FLOAT32 vector blob or None on failure."""
+        if self._disabled:
+            return None
+        try:
+            # base64 is the little-endian float32 buffer Redis expects, so it is stored without
+            # ever being expanded into a list of Python floats
+            response = await client.embeddings.create(
+                model=self.embedding_deployment,
+                input=text,
+                encoding_format="base64"
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+        embedding = response.data[0].embedding
+        if isinstance(embedding, str):
+            vector = base64.b64decode(embedding)
+        else:
+            # Deployments that ignore encoding_format return a plain list of floats
+            vector = array.array("f", embedding).tobytes()
+
+        if len(vector) != 4 * self.dimensions:
+            logger.error(
+                f"Semantic cache disabled: {self.embedding_deployment} returned {len(vector) // 4}-dimensional "
+                f"embeddings but the index expects {self.dimensions} (set SEMANTIC_CACHE_DIMENSIONS to match)"
+            )
+            self._disabled = True
+            return None
+        return vector
+
+    async def lookup(self, vector: bytes, system_prompt: str, model: str) -> str | None:
+        """Return the cached response closest to `vector`, or None if nothing is similar enough."""
+        query = (
+            Query(
+                f"(@prompt_hash:{{{_hash_prompt(system_prompt)}}} @model:{{{_escape_tag(model)}}})"
+                "=>[KNN 1 @embedding $vec AS distance]"
+            )
+            .return_fields("response", "distance")
+            .sort_by("distance")
+            .dialect(2)
+        )
+        try:
+            await self._ensure_index()
+            result = await self.redis.ft(self.index_name).search(query, query_params={"vec": vector})
+        except RedisError as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+
+        if not result.docs:
+            return None
+        doc = result.docs[0]
+        # COSINE distance is 1 - cosine similarity
+        similarity = 1.0 - float(doc.distance)
+        if similarity < self.threshold:
+            return None
+
+        try:
+            await self.redis.hincrby(doc.id, "hit_count", 1)
+        except RedisError as e:
+            logger.warning(f"Semantic cache hit count update failed: {e}")
+        logger.info(f"Semantic cache hit (similarity {similarity:.3f})")
+        return doc.response.decode("utf-8") if isinstance(doc.response, bytes) else doc.response
+
+    async def store(self, vector: bytes, prompt: str, response: str, system_prompt: str, model: str):
+        """Cache `response` for `prompt` under the given system prompt and model."""
+        key = f"{self.key_prefix}{uuid.uuid4().hex}"
+        try:
+            await self._ensure_index()
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={
+                    "embedding": vector,
+                    "prompt_hash": _hash_prompt(system_prompt),
+                    "model": model,
+                    "prompt": prompt,
+                    "response": response,
+                    "hit_count": 0
+                })
+                pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Semantic cache store failed: {e}")
+
+    async def close(self):
+        await self.redis.aclose()